@@ -1,6 +1,10 @@
+import copy
+import functools
+import multiprocessing
 import os
 import signal
 import time
+from collections import defaultdict
 
 import matplotlib as mpl
 import matplotlib.pyplot as plt
@@ -8,15 +12,20 @@ import numpy as np
 from commonroad.common.file_reader import CommonRoadFileReader
 from commonroad.common.solution import VehicleType
 from commonroad.geometry.shape import Rectangle
-from commonroad.planning.planning_problem import PlanningProblem
+from commonroad.planning.planning_problem import PlanningProblem, PlanningProblemSet
 from commonroad.prediction.prediction import TrajectoryPrediction
 from commonroad.scenario.obstacle import DynamicObstacle, ObstacleType
 from commonroad.scenario.scenario import Scenario
 from commonroad.scenario.state import CustomState
 from commonroad.scenario.trajectory import Trajectory
 from commonroad.visualization.mp_renderer import MPRenderer
+from commonroad.visualization.util import collect_center_line_colors
 from commonroad_dc.feasibility.vehicle_dynamics import VehicleParameterMapping
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.cm import ScalarMappable
 from matplotlib.collections import LineCollection
+from matplotlib.colors import Normalize
+from matplotlib.figure import Figure
 from omegaconf import DictConfig
 from PIL import Image
 
@@ -212,23 +221,24 @@ def timeout_handler(signum, frame):
     raise BaseException("Program exceeded 10 seconds")
 
 
+@functools.lru_cache(maxsize=None)
+def cached_automaton(name_file_motion_primitives: str) -> ManeuverAutomaton:
+    """Generate the maneuver automaton of a motion primitive file
+
+    The automaton does not depend on the scenario, so it is only built once per process
+    and shared by all the scenarios planned in a batch.
+    """
+    return ManeuverAutomaton.generate_automaton(name_file_motion_primitives)
+
+
 def informed_planning(scenario: Scenario, planning_problem: PlanningProblem, vehicle_params: DictConfig):
     signal.signal(signal.SIGALRM, timeout_handler)
     signal.alarm(10)
 
-    # load the xml with stores the 524 motion primitives
-    name_file_motion_primitives = 'V_0.0_20.0_Vstep_2.0_SA_-1.066_1.066_SAstep_0.18_T_0.5_Model_BMW_320i.xml'
-    # generate automaton
-    automaton = ManeuverAutomaton.generate_automaton(
-        name_file_motion_primitives)
-    # plot motion primitives
-    # plot_primitives(automaton.list_primitives)
-
     # load the xml with stores the 167 motion primitives
     name_file_motion_primitives = 'V_0.0_20.0_Vstep_4.0_SA_-1.066_1.066_SAstep_0.18_T_0.5_Model_BMW_320i.xml'
     # generate automaton
-    automaton = ManeuverAutomaton.generate_automaton(
-        name_file_motion_primitives)
+    automaton = cached_automaton(name_file_motion_primitives)
     # plot motion primitives
     # plot_primitives(automaton.list_primitives)
 
@@ -250,20 +260,77 @@ def informed_planning(scenario: Scenario, planning_problem: PlanningProblem, veh
     return True, ego_vehicle_trajectory, processing_time, None
 
 
-def multiline(xs, ys, c, ax=None, **kwargs):
+def stack_paths(paths, dtype=float) -> np.ndarray:
+    """Stack paths of different lengths into one 2D array, padded with NaN
+
+    Parameters
+    ----------
+    paths : iterable container of 1D coordinate arrays
+    dtype (optional): floating point type of the stacked array
+
+    Returns
+    -------
+    stacked : ndarray of shape (len(paths), max(len(path) for path in paths))
+    """
+    lengths = np.array([len(path) for path in paths], dtype=int)
+    stacked = np.full((len(paths), lengths.max(initial=0)), np.nan, dtype=dtype)
+    if len(paths):
+        # fill all rows at once, the mask selects the leading len(path) entries of each row in row-major order
+        stacked[np.arange(stacked.shape[1]) < lengths[:, None]] = np.concatenate(paths)
+    return stacked
+
+
+def candidate_arrays(trajs: list) -> dict:
+    """Convert the candidate trajectories of one planning cycle into a struct of arrays
+
+    Returns
+    -------
+    candidates : dict with the (M, T) NaN padded paths 'x' and 'y' (see `stack_paths`)
+        and the (M,) costs 'cost_final' of the M candidates.
+        The paths are only drawn, so they are stored in single precision.
+    """
+    return {'x': stack_paths([fp.x for fp in trajs], dtype=np.float32),
+            'y': stack_paths([fp.y for fp in trajs], dtype=np.float32),
+            'cost_final': np.array([fp.cost_final for fp in trajs], dtype=float)}
+
+
+def join_paths(paths) -> np.ndarray:
+    """Join (N, 2) paths into one polyline, separated by NaN so that they are drawn as separate lines"""
+    nan_row = np.full((1, 2), np.nan)
+    return np.concatenate([np.vstack((path, nan_row)) for path in paths] + [np.empty((0, 2))])
+
+
+def obstacle_track(obstacle: DynamicObstacle) -> np.ndarray:
+    """Collect the positions of an obstacle from time step 0 until its last known state
+
+    Returns
+    -------
+    track : ndarray of shape (num_states, 2), the row index is the time step.
+        Empty if the obstacle does not exist at time step 0.
+    """
+    if obstacle.initial_state.time_step != 0:
+        return np.empty((0, 2))
+    states = [obstacle.initial_state]
+    if isinstance(obstacle.prediction, TrajectoryPrediction):
+        states += obstacle.prediction.trajectory.state_list
+    return np.array([state.position for state in states], dtype=float)
+
+
+def multiline(xs, ys, c, ax=None, autoscale=True, **kwargs):
     """Plot lines with different colorings
 
     Parameters
     ----------
-    xs : iterable container of x coordinates
-    ys : iterable container of y coordinates
+    xs : 2D array of x coordinates, one row per line (NaN padded, see `stack_paths`)
+    ys : 2D array of y coordinates, one row per line (NaN padded, see `stack_paths`)
     c : iterable container of numbers mapped to colormap
     ax (optional): Axes to plot on.
+    autoscale (optional): rescale the axes to the lines, skip it if the axes limits are fixed anyway.
     kwargs (optional): passed to LineCollection
 
     Notes:
         len(xs) == len(ys) == len(c) is the number of line segments
-        len(xs[i]) == len(ys[i]) is the number of points for each line (indexed by i)
+        xs.shape[1] == ys.shape[1] is the (padded) number of points for each line
 
     Returns
     -------
@@ -273,8 +340,8 @@ def multiline(xs, ys, c, ax=None, **kwargs):
     # find axes
     ax = plt.gca() if ax is None else ax
 
-    # create LineCollection
-    segments = [np.column_stack([x, y]) for x, y in zip(xs, ys)]
+    # create LineCollection from a single (num_lines, num_points, 2) array
+    segments = np.stack((xs, ys), axis=-1)
     lc = LineCollection(segments, **kwargs)
 
     # set coloring of line segments
@@ -283,16 +350,200 @@ def multiline(xs, ys, c, ax=None, **kwargs):
 
     # add lines to axes and rescale
     #    Note: adding a collection doesn't autoscalee xlim/ylim
-    ax.add_collection(lc)
-    ax.autoscale()
+    ax.add_collection(lc, autolim=autoscale)
+    if autoscale:
+        ax.autoscale()
     return lc
 
 
+def grab_frame(fig: Figure, pad_inches: float = 0.1) -> Image.Image:
+    """Rasterize a figure into an RGB image, cropped like `savefig(..., bbox_inches='tight')`
+
+    Parameters
+    ----------
+    fig : Figure to rasterize at its own dpi, its canvas has to be Agg based.
+    pad_inches (optional): padding around the tight bounding box.
+
+    Returns
+    -------
+    frame : Image instance.
+    """
+    fig.canvas.draw()
+    width, height = fig.canvas.get_width_height()
+    frame = Image.frombuffer('RGBA', (width, height), fig.canvas.buffer_rgba(), 'raw', 'RGBA', 0, 1)
+
+    # the tight bounding box is given in inches with the origin at the bottom left
+    bbox = fig.get_tightbbox(fig.canvas.get_renderer()).padded(pad_inches)
+    x0, y0, x1, y1 = (np.array(bbox.extents) * fig.dpi).round().astype(int)
+    crop = (max(x0, 0), max(height - y1, 0), min(x1, width), min(height - y0, height))
+    return frame.crop(crop).convert('RGB')
+
+
+def draw_frame(rnd: MPRenderer, ego_draw_params, traffic_light_draw_params, traj_lines: tuple, i: int,
+               candidates: dict, cost_norm: Normalize, scenario: Scenario, ego_vehicle: DynamicObstacle,
+               ego_xy: np.ndarray, ego_arrows: np.ndarray, obs_arrows: list) -> list:
+    """Draw the dynamic content of the gif frame at time step `i` on top of the static background of `rnd`
+
+    The past and future ego and obstacle trajectories are drawn by updating the persistent `traj_lines`.
+    The traffic lights are only drawn if `traffic_light_draw_params` is given, see `render_frames`.
+
+    Returns
+    -------
+    frame_artists : all artists added for this frame, to be removed before the next frame.
+    """
+    rnd.draw_params.time_begin = i
+    ego_draw_params.time_begin = i
+    if traffic_light_draw_params is not None:
+        traffic_light_draw_params.time_begin = i
+        scenario.lanelet_network.draw(rnd, traffic_light_draw_params)
+    rnd.draw_list(scenario.dynamic_obstacles + scenario.phantom_obstacle)
+    ego_vehicle.draw(rnd, ego_draw_params)
+    frame_artists = list(rnd.render_dynamic())
+
+    lc = multiline(candidates['x'][:, 1:], candidates['y'][:, 1:], candidates['cost_final'], ax=rnd.ax, autoscale=False,
+                   cmap='RdYlGn_r', norm=cost_norm, lw=2, zorder=20)
+    frame_artists.append(lc)
+
+    ego_line_p, ego_line_f, obs_line_p, obs_line_f = traj_lines
+    ego_line_p.set_data(ego_xy[:i, 0], ego_xy[:i, 1])
+    ego_line_f.set_data(ego_xy[i:, 0], ego_xy[i:, 1])
+    frame_artists.append(rnd.ax.quiver(*ego_arrows[i::5].T,
+                                       scale_units='xy', angles='xy', scale=1, width=0.009, color='#AFEEEE', zorder=26))
+
+    # All obstacles share one quiver and one line per color
+    arrows_p = np.concatenate([arrows[:i:5] for arrows in obs_arrows] + [np.empty((0, 4))])
+    arrows_f = np.concatenate([arrows[i::5] for arrows in obs_arrows] + [np.empty((0, 4))])
+    frame_artists.append(rnd.ax.quiver(*arrows_p.T,
+                                       scale_units='xy', angles='xy', scale=1, width=0.006, color='#BA55D3', zorder=25))
+    frame_artists.append(rnd.ax.quiver(*arrows_f.T,
+                                       scale_units='xy', angles='xy', scale=1, width=0.006, color='#1d7eea', zorder=25))
+    obs_traj_p = join_paths([arrows[0:i, :2] for arrows in obs_arrows])
+    obs_traj_f = join_paths([arrows[i:, :2] for arrows in obs_arrows])
+    obs_line_p.set_data(obs_traj_p[:, 0], obs_traj_p[:, 1])
+    obs_line_f.set_data(obs_traj_f[:, 0], obs_traj_f[:, 1])
+
+    return frame_artists
+
+
+def render_frames(frame_ids: list, fplist: list, frame_times: list, scenario: Scenario,
+                  planning_problem_set: PlanningProblemSet, ego_vehicle: DynamicObstacle, ego_xy: np.ndarray,
+                  ego_arrows: np.ndarray, obs_arrows: list, cost_norm: Normalize, method: str, scenario_id: str,
+                  result_path: str = None) -> list:
+    """Render the gif frames `frame_ids` in memory, optionally also saving them as jpg files under `result_path`
+
+    Parameters
+    ----------
+    frame_ids : time steps of the frames to render
+    fplist : candidate arrays of each frame in `frame_ids`, see `candidate_arrays`
+    frame_times : planning time shown in the title of each frame in `frame_ids`
+    ego_xy : (N, 2) positions of the planned ego trajectory
+    ego_arrows : (N - 1, 4) positions and step differences (x, y, dx, dy) of the planned ego trajectory
+    obs_arrows : the same (x, y, dx, dy) arrays for each dynamic obstacle
+    cost_norm : cost range of the colorbar, shared by all frames
+    result_path (optional): directory to save the frames into, nothing is written to disk if None
+
+    Returns
+    -------
+    frames : palette images of the frames, in the order of `frame_ids`
+    """
+    # The frames are never shown, render them on a plain Agg canvas without going through pyplot
+    fig = Figure(figsize=(25, 10), dpi=100)
+    FigureCanvasAgg(fig)
+    mpl.rcParams['font.size'] = 20
+    # Render the static layers (road network, static obstacles, planning problem) only once,
+    # every frame below only adds and removes its own dynamic artists on the same figure
+    rnd = MPRenderer(ax=fig.add_subplot())
+    lanelet_network = scenario.lanelet_network
+    rnd.draw_params.lanelet_network.traffic_light.draw_traffic_lights = False
+    rnd.draw_list([lanelet_network] + scenario.static_obstacles +
+                  scenario.environment_obstacle + [planning_problem_set])
+    rnd.render()
+    background_callbacks = {event: list(funcs) for event, funcs in rnd.callbacks.items()}
+    ego_draw_params = copy.deepcopy(rnd.draw_params.dynamic_obstacle)
+    ego_draw_params.vehicle_shape.occupancy.shape.facecolor = "g"
+    # Traffic lights change their state, so they are left out of the background and drawn with every frame,
+    # together with the center lines they color. Per frame, the lanelet network is only drawn for the lanelets
+    # they affect, and the renderer only renders its dynamic part (center line colors and traffic light icons).
+    if lanelet_network.traffic_lights:
+        traffic_light_draw_params = copy.deepcopy(rnd.draw_params.lanelet_network)
+        traffic_light_draw_params.traffic_light.draw_traffic_lights = True
+        traffic_light_draw_params.traffic_sign.draw_traffic_signs = False
+        traffic_light_draw_params.draw_ids = list(
+            collect_center_line_colors(lanelet_network, lanelet_network.traffic_lights, 0))
+    else:
+        traffic_light_draw_params = None
+    frames = []
+
+    # The trajectory lines stay on the figure, each frame only updates their data
+    traj_lines = (rnd.ax.plot([], [], color='#9400D3', alpha=1, zorder=25, lw=1)[0],
+                  rnd.ax.plot([], [], color='#AFEEEE', alpha=1, zorder=25, lw=1)[0],
+                  rnd.ax.plot([], [], color='#BA55D3', alpha=0.8, zorder=25, lw=0.6)[0],
+                  rnd.ax.plot([], [], color='#1d7eea', alpha=0.8, zorder=25, lw=0.6)[0])
+
+    # Square view around the whole ego trajectory, the same for all frames
+    x_min, y_min = ego_xy.min(axis=0) - 8
+    x_max, y_max = ego_xy.max(axis=0) + 8
+    l = max(x_max-x_min, y_max-y_min)
+    if l == x_max - x_min:
+        xlim = (x_min, x_max)
+        ylim = (y_min - (l-(y_max-y_min))/2, y_max + (l-(y_max-y_min))/2)
+    else:
+        xlim = (x_min - (l-(x_max-x_min))/2, x_max + (l-(x_max-x_min))/2)
+        ylim = (y_min, y_max)
+    # fixed limits also turn off autoscaling, so the dynamic artists don't trigger any data limit updates
+    rnd.ax.set_xlim(xlim)
+    rnd.ax.set_ylim(ylim)
+    fig.suptitle(f'Scenario ID: {scenario_id}',
+                 fontsize=20, x=0.59, y=0.06)
+    fig.colorbar(ScalarMappable(norm=cost_norm, cmap='RdYlGn_r'), ax=rnd.ax)
+
+    # For each
+    for i, candidates, frame_time in zip(frame_ids, fplist, frame_times):
+        frame_artists = draw_frame(rnd, ego_draw_params, traffic_light_draw_params, traj_lines, i, candidates,
+                                   cost_norm, scenario, ego_vehicle, ego_xy, ego_arrows, obs_arrows)
+        if traffic_light_draw_params is not None:
+            # The traffic light icons only get their size from the xlim_changed callbacks the renderer connected
+            # for them, so apply the limits again like MPRenderer.create_video does. Connecting a callback again
+            # just returns its id, which is used to disconnect the icons of this frame once they are removed.
+            frame_cids = [rnd.ax.callbacks.connect(event, func) for event, funcs in rnd.callbacks.items()
+                          for func in funcs[len(background_callbacks.get(event, [])):]]
+            rnd.ax.set_xlim(xlim)
+            rnd.ax.set_ylim(ylim)
+
+        rnd.ax.set_title("{method}: {time}s".format(
+            method=method, time=round(frame_time, 3)))
+
+        frame = grab_frame(fig)
+        if result_path is not None:
+            # Write the frame into a jpg file
+            fig_path = os.path.join(
+                result_path, "{time_step}.jpg".format(time_step=i))
+            frame.save(fig_path, quality=85, optimize=False)
+            print("Fig saved to:", fig_path)
+
+        # Remove this frame's dynamic artists, keeping the static background
+        for art in frame_artists:
+            art.remove()
+        rnd.clear()
+        if traffic_light_draw_params is not None:
+            for cid in frame_cids:
+                rnd.ax.callbacks.disconnect(cid)
+            rnd.callbacks = defaultdict(list, {event: list(funcs) for event, funcs in background_callbacks.items()})
+
+        # quantize in the worker already, this is what the gif encoder would do with each RGB frame
+        frames.append(frame.convert('P', palette=Image.Palette.ADAPTIVE))
+
+    # Drop the figure's artists right away instead of waiting for the worker to be collected
+    fig.clear()
+    return frames
+
+
 def planning(cfg: dict, output_dir: str, input_dir: str, file: str) -> None:
     # Global benchmark settings
     method = cfg['PLANNER']  # 'informed', 'FOP', 'FOP+', 'FISS', 'FISS+'
     num_samples = (cfg['N_W_SAMPLE'], cfg['N_S_SAMPLE'], cfg['N_W_SAMPLE'])
     save_gif = cfg['SAVE_GIF']
+    save_frames = cfg.get('SAVE_FRAMES', False)
 
     vehicle_type = VehicleType.VW_VANAGON  # FORD_ESCORT, BMW_320i, VW_VANAGON
     vehicle_params = VehicleParameterMapping[vehicle_type.name].value
@@ -334,117 +585,49 @@ def planning(cfg: dict, output_dir: str, input_dir: str, file: str) -> None:
 
     ##################################################### Visualization #########################################################
     if save_gif and fplist:
-        images = []
-        # For each
-        for i in range(len(fplist)):
-            plt.figure(figsize=(25, 10))
-            mpl.rcParams['font.size'] = 20
-            rnd = MPRenderer()
-            rnd.draw_params.time_begin = i
-            scenario.draw(rnd)
-            rnd.draw_params.dynamic_obstacle.vehicle_shape.occupancy.shape.facecolor = "g"
-            ego_vehicle.draw(rnd)
-            planning_problem_set.draw(rnd)
-            rnd.render()
-            costs = []
-            xs = []
-            ys = []
-            for fp in fplist[i]:
-                costs.append(fp.cost_final)
-                xs.append(fp.x[1:])
-                ys.append(fp.y[1:])
-            lc = multiline(xs, ys, costs, ax=rnd.ax,
-                           cmap='RdYlGn_r', lw=2, zorder=20)
-            plt.colorbar(lc)
-
-            x_coords = [state.position[0]
-                        for state in ego_vehicle_trajectory.state_list]
-            y_coords = [state.position[1]
-                        for state in ego_vehicle_trajectory.state_list]
-            x_coords_p = [state.position[0]
-                          for state in ego_vehicle_trajectory.state_list[0:i]]
-            y_coords_p = [state.position[1]
-                          for state in ego_vehicle_trajectory.state_list[0:i]]
-            x_coords_f = [state.position[0]
-                          for state in ego_vehicle_trajectory.state_list[i:]]
-            y_coords_f = [state.position[1]
-                          for state in ego_vehicle_trajectory.state_list[i:]]
-            dx_ego_f = np.diff(x_coords_f)
-            dy_ego_f = np.diff(y_coords_f)
-            rnd.ax.plot(x_coords_p, y_coords_p, color='#9400D3',
-                        alpha=1,  zorder=25, lw=1)
-            rnd.ax.plot(x_coords_f, y_coords_f, color='#AFEEEE',
-                        alpha=1,  zorder=25, lw=1)
-            rnd.ax.quiver(x_coords_f[:-1:5], y_coords_f[:-1:5], dx_ego_f[::5], dy_ego_f[::5],
-                          scale_units='xy', angles='xy', scale=1, width=0.009, color='#AFEEEE', zorder=26)
-
-            x_min = min(x_coords)-8
-            x_max = max(x_coords)+8
-            y_min = min(y_coords)-8
-            y_max = max(y_coords)+8
-            l = max(x_max-x_min, y_max-y_min)
-
-            if l == x_max - x_min:
-                plt.xlim(x_min, x_max)
-                plt.ylim(y_min - (l-(y_max-y_min))/2,
-                         y_max + (l-(y_max-y_min))/2)
-            else:
-                plt.xlim(x_min - (l-(x_max-x_min))/2,
-                         x_max + (l-(x_max-x_min))/2)
-                plt.ylim(y_min, y_max)
-
-            for obs in scenario.dynamic_obstacles:
-                t = 0
-                obs_traj_x = []
-                obs_traj_y = []
-                while obs.state_at_time(t) is not None:
-                    obs_traj_x.append(obs.state_at_time(t).position[0])
-                    obs_traj_y.append(obs.state_at_time(t).position[1])
-                    t += 1
-                dx = np.diff(obs_traj_x)
-                dy = np.diff(obs_traj_y)
-                obs_traj_x = obs_traj_x[:-1]
-                obs_traj_y = obs_traj_y[:-1]
-                rnd.ax.quiver(obs_traj_x[:i:5], obs_traj_y[:i:5], dx[:i:5], dy[:i:5],
-                              scale_units='xy', angles='xy', scale=1, width=0.006, color='#BA55D3', zorder=25)
-                rnd.ax.quiver(obs_traj_x[i::5], obs_traj_y[i::5], dx[i::5], dy[i::5],
-                              scale_units='xy', angles='xy', scale=1, width=0.006, color='#1d7eea', zorder=25)
-                rnd.ax.plot(obs_traj_x[0:i], obs_traj_y[0:i],
-                            color='#BA55D3', alpha=0.8,  zorder=25, lw=0.6)
-                rnd.ax.plot(obs_traj_x[i:], obs_traj_y[i:],
-                            color='#1d7eea', alpha=0.8,  zorder=25, lw=0.6)
-            time_list.append(0)
-
-            plt.title("{method}: {time}s".format(
-                method=method, time=round(time_list[i], 3)))
-            scenario_id = os.path.splitext(file)[0]
-            plt.suptitle(f'Scenario ID: {scenario_id}',
-                         fontsize=20, x=0.59, y=0.06)
-
-            # Write the figure into a jpg file
+        scenario_id = os.path.splitext(file)[0]
+        # keep the candidates of each cycle as arrays, the visualization only needs their paths and costs
+        fplist = [candidate_arrays(trajs) for trajs in fplist]
+        ego_xy = np.array([state.position for state in ego_vehicle_trajectory.state_list])
+        ego_arrows = np.hstack((ego_xy[:-1], np.diff(ego_xy, axis=0)))
+        obs_tracks = [obstacle_track(obs) for obs in scenario.dynamic_obstacles]
+        obs_arrows = [np.hstack((obs_xy[:-1], np.diff(obs_xy, axis=0))) for obs_xy in obs_tracks]
+
+        if save_frames:
+            # Also write the frames into jpg files
             result_path = os.path.join(
                 output_dir, 'gif_cache', method, scenario_id)
-            if not os.path.exists(result_path):
-                os.makedirs(result_path)
-                print("Target directory: {} Created".format(result_path))
-            fig_path = os.path.join(
-                result_path, "{time_step}.jpg".format(time_step=i))
-            plt.savefig(fig_path, dpi=200, bbox_inches='tight')
-            print("Fig saved to:", fig_path)
-
-            # plt.show()
-            plt.close()
-
-            images.append(Image.open(fig_path))
+            os.makedirs(result_path, exist_ok=True)
+        else:
+            result_path = None
+
+        # The last planning cycle may fail without a recorded planning time
+        frame_times = [time_list[i] if i < len(time_list) else 0 for i in range(len(fplist))]
+
+        # All frames share one colorbar over the finite costs of all candidates
+        costs = np.concatenate([candidates['cost_final'] for candidates in fplist] + [np.empty(0)])
+        costs = costs[np.isfinite(costs)]
+        cost_norm = Normalize(costs.min(), costs.max()) if costs.size else Normalize(0, 1)
+
+        # Render contiguous chunks of frames in parallel, each worker sets up its own figure once
+        num_workers = min(cfg.get('NUM_WORKERS', 0) or os.cpu_count(), len(fplist))
+        frame_chunks = [chunk.tolist() for chunk in np.array_split(np.arange(len(fplist)), num_workers)]
+        render_args = [(frame_ids, [fplist[i] for i in frame_ids], [frame_times[i] for i in frame_ids], scenario,
+                        planning_problem_set, ego_vehicle, ego_xy, ego_arrows, obs_arrows, cost_norm, method,
+                        scenario_id, result_path)
+                       for frame_ids in frame_chunks]
+        if num_workers > 1:
+            with multiprocessing.Pool(num_workers) as pool:
+                frames = sum(pool.starmap(render_frames, render_args), [])
+        else:
+            frames = render_frames(*render_args[0])
 
-        # Genereate a gif file from the previously saved jpg files
+        # Genereate a gif file from the rendered frames
         gif_dirpath = os.path.join(output_dir, 'gif/', method)
-        if not os.path.exists(gif_dirpath):
-            os.makedirs(gif_dirpath)
-            print("Target directory: {} Created".format(gif_dirpath))
+        os.makedirs(gif_dirpath, exist_ok=True)
         gif_filepath = os.path.join(gif_dirpath, f"{scenario_id}.gif")
-        images[0].save(gif_filepath, save_all=True,
-                       append_images=images[1:], optimize=True, duration=100, loop=0)
+        frames[0].save(gif_filepath, save_all=True,
+                       append_images=frames[1:], duration=100, loop=0)
         print("Gif saved to:", gif_filepath)
 
     return
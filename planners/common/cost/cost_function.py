@@ -26,17 +26,22 @@ class CostFunction:
         # Xis = np.exp(-dists)
         # return self.w_D * sum(Xis)
     
+    # the sums of squares are computed as dot products, the builtin sum() would iterate over the array in Python
     def cost_velocity_offset(self, vels: list, v_target: float) -> float:
-        return self.w_V * sum(np.power(np.subtract(vels, v_target), 2))
+        offsets = np.subtract(vels, v_target)
+        return self.w_V * np.dot(offsets, offsets)
     
     def cost_acceleration(self, accels: list) -> float:
-        return self.w_A * sum(np.power(accels, 2))
+        accels = np.asarray(accels)
+        return self.w_A * np.dot(accels, accels)
             
     def cost_jerk(self, jerks: list) -> float:
-        return self.w_J * sum(np.power(jerks, 2))
+        jerks = np.asarray(jerks)
+        return self.w_J * np.dot(jerks, jerks)
     
     def cost_lane_center_offset(self, offsets: list) -> float:
-        return self.w_LC * sum(np.power(offsets, 2))
+        offsets = np.asarray(offsets)
+        return self.w_LC * np.dot(offsets, offsets)
     
     def cost_total(self, traj: FrenetTrajectory, target_speed: float) -> float:
         cost_time = 10.0 - traj.t[-1] # self.cost_time()
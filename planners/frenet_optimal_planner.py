@@ -63,6 +63,7 @@ class FrenetOptimalPlanner(object):
         self.cubic_spline = None
         self.best_traj = None
         self.all_trajs = []
+        self.obstacle_polygons = {}         # cached obstacle polygons by (obstacle_id, time step)
         # Statistics
         self.stats = Stats()
 
@@ -149,10 +150,10 @@ class FrenetOptimalPlanner(object):
             # if any([abs(c_dd) > self.vehicle.max_kappa_dd for c_dd in traj.c_dd]):
             #     continue
             # Max speed check
-            if any([v > self.vehicle.max_speed for v in traj.s_d]):
+            if np.any(np.asarray(traj.s_d) > self.vehicle.max_speed):
                 continue
             # Max accel check
-            if any([abs(a) > self.vehicle.max_accel for a in traj.s_dd]):
+            if np.any(np.abs(np.asarray(traj.s_dd)) > self.vehicle.max_accel):
                 continue
 
             passed.append(i)
@@ -165,6 +166,18 @@ class FrenetOptimalPlanner(object):
         
         return polygon_rotated
     
+    def obstacle_polygon(self, obstacle, t_step: int) -> Polygon:
+        # obstacle predictions never change, so each polygon is built once and shared by all candidates and planning cycles
+        key = (obstacle.obstacle_id, t_step)
+        if key not in self.obstacle_polygons:
+            state = obstacle.state_at_time(t_step)
+            if state is None:
+                self.obstacle_polygons[key] = None
+            else:
+                self.obstacle_polygons[key] = self.construct_polygon(obstacle.obstacle_shape.shapely_object, state.position[0], state.position[1], state.orientation)
+
+        return self.obstacle_polygons[key]
+    
     def has_collision(self, traj: FrenetTrajectory, obstacles: list, time_step_now: int = 0, check_res: int = 1) -> tuple:
         num_polys = 0
         if len(obstacles) <= 0:
@@ -181,12 +194,11 @@ class FrenetOptimalPlanner(object):
                     print(f"Failed to create Polygon for t={i} x={traj.x[i]}, y={traj.y[i]}, yaw={traj.y[i]}")
                     return True, num_polys
                 else:
-                    # construct a polygon for the obstacle at time step i
+                    # look up the polygons of the obstacles at time step i
                     t_step = i + time_step_now
                     for obstacle in obstacles:
-                        state = obstacle.state_at_time(t_step)
-                        if state is not None:
-                            obstacle_polygon = self.construct_polygon(obstacle.obstacle_shape.shapely_object, state.position[0], state.position[1], state.orientation)
+                        obstacle_polygon = self.obstacle_polygon(obstacle, t_step)
+                        if obstacle_polygon is not None:
                             num_polys += 1
                             if ego_polygon.intersects(obstacle_polygon):
                                 # plot_collision(ego_polygon, obstacle_polygon, t_step)